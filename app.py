@@ -1,9 +1,21 @@
 import os
+import time
+import random
+import asyncio
 import aiohttp
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import discord
+import orjson
 from discord.ext import tasks
 from dotenv import load_dotenv
 
+try:
+    import uvloop  # libuv-backed event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 # -----------------------
 # Load environment variables
 # -----------------------
@@ -23,54 +35,294 @@ client = discord.Client(intents=intents)
 AXIOM_URL = "https://api.axiom.xyz/trending"
 PUMPFUN_URL = "https://pump.fun/api/trending"
 
+# -----------------------
+# Shared HTTP Session
+# -----------------------
+# One session for the whole bot lifetime so the connection pool (and its
+# TCP+TLS handshakes) survives between scan cycles.
+_http: aiohttp.ClientSession | None = None
+
+def create_http_session():
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=64,
+            limit_per_host=32,
+            ttl_dns_cache=600,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+        ),
+        cookie_jar=aiohttp.DummyCookieJar(),
+        timeout=aiohttp.ClientTimeout(total=15, connect=3),
+        headers={"User-Agent": "meme-scanner/1.0"},
+    )
+
+# Hosts pinged between scans so their pooled connections stay open
+WARMUP_URLS = ("https://api.axiom.xyz/", "https://pump.fun/")
+# Hosts whose last ping failed; only state changes are logged
+_warm_failing = set()
+
+@tasks.loop(seconds=30)
+async def keep_http_warm():
+    if _http is None or _http.closed:
+        return
+    for url in WARMUP_URLS:
+        try:
+            async with _http.head(url, allow_redirects=False):
+                pass
+        except Exception as e:
+            if url not in _warm_failing:
+                _warm_failing.add(url)
+                print(f"[WARN] Keepalive ping to {url} failed: {e}")
+        else:
+            if url in _warm_failing:
+                _warm_failing.discard(url)
+                print(f"[DEBUG] Keepalive ping to {url} recovered")
+
 # -----------------------
 # Fetch JSON Helper
 # -----------------------
-async def fetch_json(session, url, headers=None):
+FETCH_RETRIES = 3
+RETRY_AFTER_MAX = 30
+
+def parse_retry_after(value, default=1.0):
+    """Seconds to wait per a Retry-After header (delta or HTTP-date), capped."""
     try:
-        async with session.get(url, headers=headers) as resp:
-            return await resp.json()
-    except Exception as e:
-        print(f"[ERROR] Fetching {url}: {e}")
-        return None
+        delay = float(value)
+    except (TypeError, ValueError):
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            delay = default
+    return min(max(delay, 0.0), RETRY_AFTER_MAX)
+
+async def fetch_json(session, url, headers=None):
+    for attempt in range(FETCH_RETRIES):
+        last = attempt == FETCH_RETRIES - 1
+        try:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status < 400:
+                    return orjson.loads(await resp.read())
+                # Only rate limits and server errors are worth another try
+                if last or (resp.status != 429 and resp.status < 500):
+                    print(f"[ERROR] Fetching {url}: HTTP {resp.status}")
+                    return None
+                if resp.status == 429:
+                    delay = parse_retry_after(resp.headers.get("Retry-After"))
+                else:
+                    delay = 2 ** attempt + random.random()
+                reason = f"HTTP {resp.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if last:
+                print(f"[ERROR] Fetching {url}: {e}")
+                return None
+            delay = 2 ** attempt + random.random()
+            reason = e
+        except Exception as e:
+            print(f"[ERROR] Fetching {url}: {e}")
+            return None
+        print(f"[WARN] Fetching {url} failed ({reason}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+    return None
+
+# -----------------------
+# Recently Posted Coins
+# -----------------------
+# Mint -> time queued for posting, oldest first, so the same coin isn't
+# reposted across consecutive cycles. Entries are added when a post is
+# queued and removed again if the send worker fails to deliver it.
+POSTED = OrderedDict()
+POSTED_TTL = 3600
+POSTED_MAX = 4096
+
+def already_posted(key):
+    now = time.monotonic()
+    while POSTED and now - next(iter(POSTED.values())) > POSTED_TTL:
+        POSTED.popitem(last=False)
+    return key in POSTED
+
+def mark_posted(key):
+    POSTED[key] = time.monotonic()
+    POSTED.move_to_end(key)
+    if len(POSTED) > POSTED_MAX:
+        POSTED.popitem(last=False)
+
+def forget_posted(key):
+    POSTED.pop(key, None)
 
 # -----------------------
 # Scan Memecoins (Filters Off)
 # -----------------------
 async def scan_memecoins():
     results = []
-    async with aiohttp.ClientSession() as session:
-        print("[DEBUG] Starting memecoin scan...")
-
-        # Axiom Surge
-        axiom_data = await fetch_json(session, AXIOM_URL)
-        if axiom_data and "trending" in axiom_data:
-            print(f"[DEBUG] Found {len(axiom_data['trending'])} coins on 
-Axiom")
-            for coin in axiom_data["trending"]:
-                results.append({
-                    "name": coin["name"],
-                    "symbol": coin["symbol"],
-                    "link": f"https://axiom.xyz/token/{coin['id']}",
-                    "marketCap": coin.get("marketCap", "N/A")
-                })
-
-        # Pump.fun
-        pump_data = await fetch_json(session, PUMPFUN_URL)
-        if pump_data and "coins" in pump_data:
-            print(f"[DEBUG] Found {len(pump_data['coins'])} coins on 
-Pump.fun")
-            for coin in pump_data["coins"]:
-                results.append({
-                    "name": coin["name"],
-                    "symbol": coin["symbol"],
-                    "link": f"https://pump.fun/{coin['mint']}",
-                    "marketCap": coin.get("marketCap", "N/A")
-                })
+    seen = set()
+    print("[DEBUG] Starting memecoin scan...")
+
+    # Both sources are independent, so fetch them concurrently
+    axiom_data, pump_data = await asyncio.gather(
+        fetch_json(_http, AXIOM_URL),
+        fetch_json(_http, PUMPFUN_URL),
+        return_exceptions=True,
+    )
+
+    # Axiom Surge
+    if isinstance(axiom_data, Exception):
+        print(f"[ERROR] Axiom scan failed: {axiom_data}")
+    elif axiom_data and "trending" in axiom_data:
+        print(f"[DEBUG] Found {len(axiom_data['trending'])} coins on Axiom")
+        for coin in axiom_data["trending"]:
+            key = coin.get("id")
+            if not key or key in seen or already_posted(key):
+                continue
+            seen.add(key)
+            results.append({
+                "key": key,
+                "name": coin["name"],
+                "symbol": coin["symbol"],
+                "link": f"https://axiom.xyz/token/{coin['id']}",
+                "marketCap": coin.get("marketCap", "N/A")
+            })
+
+    # Pump.fun
+    if isinstance(pump_data, Exception):
+        print(f"[ERROR] Pump.fun scan failed: {pump_data}")
+    elif pump_data and "coins" in pump_data:
+        print(f"[DEBUG] Found {len(pump_data['coins'])} coins on Pump.fun")
+        for coin in pump_data["coins"]:
+            key = coin.get("mint")
+            if not key or key in seen or already_posted(key):
+                continue
+            seen.add(key)
+            results.append({
+                "key": key,
+                "name": coin["name"],
+                "symbol": coin["symbol"],
+                "link": f"https://pump.fun/{coin['mint']}",
+                "marketCap": coin.get("marketCap", "N/A")
+            })
 
     print(f"[DEBUG] Total coins collected this cycle: {len(results)}")
     return results
 
+# -----------------------
+# Message Batching
+# -----------------------
+DISCORD_MSG_LIMIT = 2000
+COINS_PER_MESSAGE = 10
+COIN_TEMPLATE = "🔥 **{name} ({symbol})**\n💰 MC: {marketCap}\n🔗 {link}"
+
+def batch_messages(entries):
+    """Pack (key, post) pairs into as few messages as Discord's 2000-char cap
+    allows, yielding (keys, content) so callers know which coins each covers."""
+    keys = []
+    buf = []
+    size = 0
+    for key, msg in entries:
+        msg = msg[:DISCORD_MSG_LIMIT]
+        # +2 for the "\n\n" separator between posts
+        if buf and (size + 2 + len(msg) > DISCORD_MSG_LIMIT or len(buf) >= COINS_PER_MESSAGE):
+            yield keys, "\n\n".join(buf)
+            keys = []
+            buf = []
+            size = 0
+        size += len(msg) + (2 if buf else 0)
+        keys.append(key)
+        buf.append(msg)
+    if buf:
+        yield keys, "\n\n".join(buf)
+
+# -----------------------
+# Discord Rate Limiting
+# -----------------------
+class AsyncTokenBucket:
+    """Async token bucket: `rate` tokens refilled evenly every `per` seconds."""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.updated = now
+                self.tokens = min(self.rate, self.tokens + elapsed * self.rate / self.per)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+# Discord allows 5 messages per 5 seconds per channel
+_send_buckets = {}
+
+async def send_message(channel, content):
+    bucket = _send_buckets.get(channel.id)
+    if bucket is None:
+        bucket = _send_buckets[channel.id] = AsyncTokenBucket(5, 5.0)
+
+    # The bucket keeps us under the channel limit up front; any 429 that
+    # still happens is already slept on and retried inside discord.py.
+    await bucket.acquire()
+    return await channel.send(content)
+
+# -----------------------
+# Discord Send Queue
+# -----------------------
+# Every post goes through this queue; a single worker coalesces whatever
+# arrives close together into batched messages.
+# Items are (mint or None, content) pairs.
+_discord_queue: asyncio.Queue[tuple[str | None, str]] = asyncio.Queue()
+_discord_worker: asyncio.Task | None = None
+
+async def _discord_sender():
+    while True:
+        msgs = [await _discord_queue.get()]
+        delivered = set()
+        try:
+            while len(msgs) < COINS_PER_MESSAGE:
+                try:
+                    msgs.append(await asyncio.wait_for(_discord_queue.get(), timeout=0.5))
+                except asyncio.TimeoutError:
+                    break
+
+            channel = client.get_channel(CHANNEL_ID)
+            if not channel:
+                print(f"[WARN] Bot could not find the channel, dropping {len(msgs)} messages.")
+                continue
+            for keys, batch in batch_messages(msgs):
+                try:
+                    await send_message(channel, batch)
+                except Exception as e:
+                    print(f"[ERROR] Sending to channel {channel.id}: {e}")
+                else:
+                    delivered.update(keys)
+        except Exception as e:
+            print(f"[ERROR] Discord send worker: {e}")
+        finally:
+            # Anything not delivered may be picked up again by the next scan
+            for key, _ in msgs:
+                if key is not None and key not in delivered:
+                    forget_posted(key)
+            for _ in msgs:
+                _discord_queue.task_done()
+
+def _on_discord_worker_done(task):
+    # The worker never returns on its own; if it died, log why and restart it
+    # so queued posts don't pile up unread until the next reconnect.
+    if task.cancelled():
+        return
+    print(f"[ERROR] Discord send worker stopped: {task.exception()!r}, restarting")
+    start_discord_worker()
+
+def start_discord_worker():
+    global _discord_worker
+    if _discord_worker is None or _discord_worker.done():
+        _discord_worker = asyncio.create_task(_discord_sender())
+        _discord_worker.add_done_callback(_on_discord_worker_done)
+
 # -----------------------
 # Discord Posting Loop
 # -----------------------
@@ -86,25 +338,47 @@ async def post_trending():
         print("[DEBUG] No coins found this cycle.")
         return
 
-    for coin in coins:
-        msg = f"🔥 **{coin['name']} ({coin['symbol']})**\n💰 MC: 
-{coin['marketCap']}\n🔗 {coin['link']}"
-        await channel.send(msg)
+    # Format everything first; the send worker handles batching and throttling
+    msgs = [(coin["key"], COIN_TEMPLATE.format_map(coin)) for coin in coins]
+    for key, msg in msgs:
+        mark_posted(key)
+        _discord_queue.put_nowait((key, msg))
 
 # -----------------------
 # On Ready Event
 # -----------------------
 @client.event
 async def on_ready():
+    global _http
+    if _http is None or _http.closed:
+        _http = create_http_session()
+    start_discord_worker()
     print(f"✅ Logged in as {client.user}")
     channel = client.get_channel(CHANNEL_ID)
     if channel:
-        await channel.send("✅ Bot is live and ready! Test message sent.")
+        _discord_queue.put_nowait((None, "✅ Bot is live and ready! Test message sent."))
     await post_trending()  # Run immediately once
-    post_trending.start()   # Start loop every 5 minutes
+    # on_ready fires again after reconnects; the loops are already running then
+    if not post_trending.is_running():
+        post_trending.start()   # Start loop every 5 minutes
+    if not keep_http_warm.is_running():
+        keep_http_warm.start()  # Keep pooled connections alive between scans
 
 # -----------------------
 # Run Bot
 # -----------------------
-client.run(DISCORD_TOKEN)
+async def main():
+    # Client.run() does this for us; client.start() does not
+    discord.utils.setup_logging()
+    try:
+        async with client:
+            await client.start(DISCORD_TOKEN)
+    finally:
+        if _http is not None:
+            await _http.close()
+
+if uvloop is not None:
+    uvloop.run(main())
+else:
+    asyncio.run(main())
 